@@ -1,35 +1,34 @@
-import pandas as pd
+import numpy as np
+import pyarrow.compute as pc
 import matplotlib.pyplot as plt
 import os
 
+from daily_stats import daily_agg, format_month_day
+from data_io import get_df
+
 # Constants
-INPUT_CSV_1 = 'shipping_data_1.csv'
-INPUT_CSV_2 = 'shipping_data_2.csv'
 RESULTS_FILE = 'output/compensation_analysis_results.txt'  # Ensure this path is correct
 OUTPUT_DIR = 'output'
+COLUMNS = ['shipped_date', 'total_compensation', 'compensation_reason']
+# Set INTERACTIVE=1 to display charts as well as saving them
+INTERACTIVE = os.environ.get('INTERACTIVE', '').lower() in ('1', 'true', 'yes')
 
 def create_output_dir():
     """Create output directory if not exists."""
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-def load_data(files):
-    """Load and concatenate CSV files."""
+def load_data():
+    """Load compensated shipments from the shared Parquet cache."""
     try:
-        dfs = [pd.read_csv(file) for file in files]
-        df = pd.concat(dfs, ignore_index=True)
-        print("CSV files read and concatenated successfully.")
+        # Only compensated shipments are analyzed, so the filter is pushed into the read
+        df = get_df(columns=COLUMNS, filters=pc.field('total_compensation').is_valid())
+        print("Shipping data loaded successfully.")
         return df
     except Exception as e:
-        print(f"Error reading or concatenating CSV files: {e}")
+        print(f"Error loading shipping data: {e}")
         return None
 
-def preprocess_data(df):
-    """Convert date columns to datetime format."""
-    df['shipped_date'] = pd.to_datetime(df['shipped_date'])
-    df['compensated_at_date'] = pd.to_datetime(df['compensated_at_date'], errors='coerce')
-    return df
-
 def analyze_compensations(df):
     """Analyze compensation data and write results to a file."""
     print("Starting analysis of compensations...")
@@ -39,13 +38,17 @@ def analyze_compensations(df):
         
         # Calculate total compensated shipments and total compensation amount
         total_compensated_transactions = len(compensation_df)
-        total_compensation = compensation_df['total_compensation'].sum()
+        compensation = compensation_df['total_compensation'].to_numpy()
+        total_compensation = compensation.sum()
         
-        # Compensation by Amount Summary
-        avg_compensation = compensation_df['total_compensation'].mean()
-        median_compensation = compensation_df['total_compensation'].median()
-        max_compensation = compensation_df['total_compensation'].max()
-        min_compensation = compensation_df['total_compensation'].min()
+        # Compensation by Amount Summary; the rows are NaN-free, so the mean follows from the
+        # sum and a single percentile pass yields the minimum, median and maximum
+        if total_compensated_transactions:
+            avg_compensation = total_compensation / total_compensated_transactions
+            min_compensation, median_compensation, max_compensation = np.percentile(compensation, [0, 50, 100])
+        else:
+            # No compensated shipments: the statistics are undefined, as with an empty mean
+            avg_compensation = min_compensation = median_compensation = max_compensation = np.nan
 
         compensation_amounts_summary = (
             f"Total Compensation Amount: ${total_compensation:.2f}\n"
@@ -62,25 +65,33 @@ def analyze_compensations(df):
         f.write(compensation_amounts_summary)
 
         # Compensation by Reason Summary
-        compensation_by_reason = compensation_df.groupby('compensation_reason').agg(
-            count=('total_compensation', 'size'),
-            total_amount=('total_compensation', 'sum'),
-            avg_amount=('total_compensation', 'mean')
-        ).reset_index()
+        compensation_by_reason = (
+            compensation_df.groupby('compensation_reason', observed=True)['total_compensation']
+            .agg(['size', 'sum', 'mean'])
+            .rename(columns={'size': 'count', 'sum': 'total_amount', 'mean': 'avg_amount'})
+            .reset_index()
+        )
 
         # Add weights (percentages) for compensated shipments
-        compensation_by_reason['transaction_weight'] = compensation_by_reason['count'] / total_compensated_transactions * 100
-        compensation_by_reason['amount_weight'] = compensation_by_reason['total_amount'] / total_compensation * 100
+        compensation_by_reason['transaction_weight'] = compensation_by_reason['count'].to_numpy() / total_compensated_transactions * 100
+        compensation_by_reason['amount_weight'] = compensation_by_reason['total_amount'].to_numpy() / total_compensation * 100
 
         # Format the compensation by reason summary for file writing
         compensation_by_reason_summary = "\n".join(
-            f"{row['compensation_reason']}: "
-            f"Count = {row['count']}, "
-            f"Total Amount = ${row['total_amount']:.2f}, "
-            f"Average Amount = ${row['avg_amount']:.2f}, "
-            f"Transaction Weight = {row['transaction_weight']:.2f}%, "
-            f"Amount Weight = {row['amount_weight']:.2f}%"
-            for idx, row in compensation_by_reason.iterrows()
+            f"{reason}: "
+            f"Count = {count}, "
+            f"Total Amount = ${total_amount:.2f}, "
+            f"Average Amount = ${avg_amount:.2f}, "
+            f"Transaction Weight = {transaction_weight:.2f}%, "
+            f"Amount Weight = {amount_weight:.2f}%"
+            for reason, count, total_amount, avg_amount, transaction_weight, amount_weight in zip(
+                compensation_by_reason['compensation_reason'].to_numpy(),
+                compensation_by_reason['count'].to_numpy(),
+                compensation_by_reason['total_amount'].to_numpy(),
+                compensation_by_reason['avg_amount'].to_numpy(),
+                compensation_by_reason['transaction_weight'].to_numpy(),
+                compensation_by_reason['amount_weight'].to_numpy()
+            )
         )
         
         # Print and write compensation by reason summary
@@ -92,46 +103,41 @@ def analyze_compensations(df):
 
 def analyze_seasonal_patterns(df):
     """Perform seasonal pattern analysis and create stacked area chart."""
-    # Convert shipment dates to MM-DD format for seasonal analysis
-    df['shipped_month_day'] = df['shipped_date'].dt.strftime('%m-%d')
-    
-    # Group by shipment month-day and compensation reason to sum total compensation
-    grouped_df = df.groupby(['shipped_month_day', 'compensation_reason']).agg(
-        total_compensation=('total_compensation', 'sum')
-    ).reset_index()
+    # Total compensation per shipment month-day and compensation reason
+    grouped = daily_agg(df)['total_compensation']
+
+    # Drop shipments without a compensation reason
+    grouped = grouped[grouped.index.get_level_values('compensation_reason').notna()]
 
-    # Drop rows with NaN values
-    grouped_df = grouped_df.dropna()
+    # Unstack reasons into columns for stacked area chart format, filling gaps while building
+    pivot_df = grouped.unstack(fill_value=0)
 
-    # Pivot the grouped dataframe for stacked area chart format
-    pivot_df = grouped_df.pivot(index='shipped_month_day', columns='compensation_reason', values='total_compensation')
-    pivot_df.fillna(0, inplace=True)
+    # Format the MMDD keys as MM-DD labels for the chart axis
+    pivot_df.index = pivot_df.index.map(format_month_day)
 
     # Plotting the stacked area chart
-    plt.figure(figsize=(14, 8))
-    pivot_df.plot.area(stacked=True, figsize=(14, 8), cmap='tab20')
+    fig, ax = plt.subplots(figsize=(14, 8))
+    pivot_df.plot.area(stacked=True, ax=ax, cmap='tab20')
     plt.xlabel('Month-Day')
     plt.ylabel('Total Compensation Amount')
     plt.title('Proportion of Compensation Amount by Shipment Date and Reason')
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.legend(title='Compensation Reason')
-    plt.savefig(os.path.join(OUTPUT_DIR, 'compensation_stacked_area.png'))
-    plt.show()
+    fig.savefig(os.path.join(OUTPUT_DIR, 'compensation_stacked_area.png'), dpi=100, bbox_inches='tight')
+    if INTERACTIVE:
+        plt.show()
+    plt.close(fig)
     print("Seasonal pattern analysis completed and chart saved.")
 
 def main():
     create_output_dir()
     print("Output directory created.")
     
-    input_files = [INPUT_CSV_1, INPUT_CSV_2]
-    df = load_data(input_files)
+    df = load_data()
     print("Data loaded.")
     
     if df is not None:
-        df = preprocess_data(df)
-        print("Data preprocessed.")
-        
         analyze_compensations(df)
         print("Compensation analysis completed.")
     
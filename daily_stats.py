@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import weakref
+
+# Daily aggregates already computed this run, keyed by id() of the source frame
+_DAILY_AGG_CACHE = {}
+
+def month_day_key(dates):
+    """Key dates by month and day as MMDD integers; `dates` must not contain NaT."""
+    return (dates.dt.month * 100 + dates.dt.day).astype(np.int16)
+
+def format_month_day(key):
+    """Format an MMDD integer key as an MM-DD label."""
+    return f"{key // 100:02d}-{key % 100:02d}"
+
+def daily_agg(df):
+    """Aggregate shipments per MMDD key (and compensation reason, if loaded) in one pass.
+
+    Returns counts and sums rather than means so every caller can derive its own
+    statistic from the same aggregate. Results are cached for the lifetime of `df`.
+    """
+    cached = _DAILY_AGG_CACHE.get(id(df))
+    # The weak reference guards against a new frame reusing the id of a collected one
+    if cached is not None and cached[0]() is df:
+        return cached[1]
+
+    # Shipments without a date cannot be keyed by day, so they are left out entirely
+    dated = df[df['shipped_date'].notna()] if df['shipped_date'].hasnans else df
+    keys = [month_day_key(dated['shipped_date']).rename('shipped_month_day')]
+    if 'compensation_reason' in df.columns:
+        keys.append('compensation_reason')
+
+    aggregations = {'count': ('shipped_date', 'size')}
+    if 'total_compensation' in df.columns:
+        aggregations['total_compensation'] = ('total_compensation', 'sum')
+        aggregations['count_compensation'] = ('total_compensation', 'count')
+    if 'delivery_time_business_days' in df.columns:
+        aggregations['sum_delivery'] = ('delivery_time_business_days', 'sum')
+        aggregations['count_delivery'] = ('delivery_time_business_days', 'count')
+
+    # Keep shipments without a reason so per-day totals still include them
+    daily = dated.groupby(keys, dropna=False, observed=True).agg(**aggregations)
+    _DAILY_AGG_CACHE[id(df)] = (weakref.ref(df), daily)
+    # Evict the entry once `df` is garbage-collected
+    weakref.finalize(df, _DAILY_AGG_CACHE.pop, id(df), None)
+    return daily
+
+def daily_means(df):
+    """Average delivery time and compensation amount per MMDD key."""
+    daily = daily_agg(df).groupby(level='shipped_month_day').sum()
+    return pd.DataFrame({
+        'avg_delivery_time': daily['sum_delivery'] / daily['count_delivery'],
+        'avg_compensation_amount': daily['total_compensation'] / daily['count_compensation']
+    })
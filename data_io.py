@@ -0,0 +1,94 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import os
+import tempfile
+
+# Constants
+INPUT_CSV_1 = 'shipping_data_1.csv'
+INPUT_CSV_2 = 'shipping_data_2.csv'
+FILES = [INPUT_CSV_1, INPUT_CSV_2]
+CACHE_DIR = 'cache'
+CACHE_FILE = os.path.join(CACHE_DIR, 'shipping.parquet')
+COLUMNS = [
+    'shipped_date', 'compensated_at_date', 'total_compensation', 'delivery_time_business_days',
+    'has_marketplace_cs_ticket', 'route', 'from_sc_code', 'to_sc_code', 'compensation_reason'
+]
+# Low-cardinality string keys, stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ['route', 'from_sc_code', 'to_sc_code', 'compensation_reason']
+# Explicit column types so the CSV reader never has to infer them
+COLUMN_TYPES = {
+    'shipped_date': pa.timestamp('ns'),
+    # Read as text so unparseable compensation dates can be nulled rather than abort the read
+    'compensated_at_date': pa.string(),
+    'total_compensation': pa.float64(),
+    'delivery_time_business_days': pa.int16(),
+    'has_marketplace_cs_ticket': pa.bool_(),
+    **{column: pa.dictionary(pa.int32(), pa.string()) for column in CATEGORICAL_COLUMNS}
+}
+CONVERT_OPTIONS = pacsv.ConvertOptions(
+    include_columns=COLUMNS,
+    column_types=COLUMN_TYPES,
+    null_values=['NULL'],
+    strings_can_be_null=True,
+    true_values=['1'],
+    false_values=['0'],
+    timestamp_parsers=['%d/%m/%Y %H:%M']
+)
+
+def cache_is_stale():
+    """Check whether the Parquet cache is missing or older than its sources."""
+    if not os.path.exists(CACHE_FILE):
+        return True
+    cache_mtime = os.path.getmtime(CACHE_FILE)
+    # This module defines the cached schema, so editing it invalidates the cache too
+    return any(os.path.getmtime(source) > cache_mtime for source in FILES + [__file__])
+
+def build_cache():
+    """Scan the CSV files once and write the combined data to a Parquet cache."""
+    if not os.path.exists(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+
+    # PyArrow parses each memory-mapped file on all cores straight into Arrow columns
+    tables = []
+    for file in FILES:
+        with pa.memory_map(file) as source:
+            tables.append(pacsv.read_csv(source, convert_options=CONVERT_OPTIONS))
+    table = pa.concat_tables(tables).unify_dictionaries()
+
+    # Invalid compensation dates become nulls, as with errors='coerce'
+    index = table.schema.get_field_index('compensated_at_date')
+    compensated_at = pc.strptime(table.column(index), format='%d/%m/%Y', unit='ns', error_is_null=True)
+    table = table.set_column(index, 'compensated_at_date', compensated_at)
+
+    # pandas integer and bool columns cannot hold missing values, so store the days
+    # and the ticket flag as float32, which represents both exactly
+    for column in ['delivery_time_business_days', 'has_marketplace_cs_ticket']:
+        index = table.schema.get_field_index(column)
+        table = table.set_column(index, column, table.column(index).cast(pa.float32()))
+
+    # Write to a temporary file and swap it in, so an interrupted or concurrent build
+    # never leaves a truncated cache that looks newer than its sources
+    fd, temp_file = tempfile.mkstemp(dir=CACHE_DIR, suffix='.parquet.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, temp_file, compression='snappy')
+        os.replace(temp_file, CACHE_FILE)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+    print(f"Parquet cache written to {CACHE_FILE}.")
+
+def get_df(columns=None, filters=None):
+    """Load shipping data from the Parquet cache, building it from the CSV files if needed."""
+    if cache_is_stale():
+        build_cache()
+    df = pd.read_parquet(CACHE_FILE, columns=columns, filters=filters, engine='pyarrow')
+
+    # Categories come back in order of first appearance; sort them so that sorted
+    # groupbys keep the same lexical order they had on plain string columns
+    for column in df.select_dtypes('category').columns:
+        df[column] = df[column].cat.reorder_categories(sorted(df[column].cat.categories))
+    return df
@@ -1,17 +1,26 @@
+import numexpr as ne
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from numba import njit
+
+from daily_stats import daily_means, format_month_day
+from data_io import get_df
 
 # Constants
-INPUT_CSV_1 = 'shipping_data_1.csv'
-INPUT_CSV_2 = 'shipping_data_2.csv'
 RESULTS_DIR = 'results'
 
-FILES = [INPUT_CSV_1, INPUT_CSV_2]
 COMBINED_RESULTS_FILE = 'consolidated_analysis_results.csv'
 CORRELATION_RESULTS_FILE = 'correlation_analysis_results.csv'
 ANALYSIS_RESULTS_FILE = 'analysis_results.txt'
+# Set INTERACTIVE=1 to display charts as well as saving them
+INTERACTIVE = os.environ.get('INTERACTIVE', '').lower() in ('1', 'true', 'yes')
+COLUMNS = [
+    'shipped_date', 'compensated_at_date', 'total_compensation', 'delivery_time_business_days',
+    'has_marketplace_cs_ticket', 'route', 'from_sc_code', 'to_sc_code'
+]
 
 
 def create_results_dir():
@@ -19,117 +28,182 @@ def create_results_dir():
     if not os.path.exists(RESULTS_DIR):
         os.makedirs(RESULTS_DIR)
 
-def load_and_preprocess_data(files):
-    """Load and preprocess CSV files."""
+def load_and_preprocess_data():
+    """Load shipping data from the shared Parquet cache, derive resolution times and key SC pairs."""
     try:
-        dfs = [pd.read_csv(file) for file in files]
-        df = pd.concat(dfs, ignore_index=True)
-        print("CSV files read and concatenated successfully.")
-        df['shipped_date'] = pd.to_datetime(df['shipped_date'])
-        df['compensated_at_date'] = pd.to_datetime(df['compensated_at_date'], errors='coerce')
+        df = get_df(columns=COLUMNS)
+        print("Shipping data loaded successfully.")
+        df['resolution_time'] = (df['compensated_at_date'] - df['shipped_date']).dt.days.astype('Int32')
+        df['sc_pair'] = factorize_sc_pairs(df)
         return df
     except Exception as e:
-        print(f"Error reading or concatenating CSV files: {e}")
+        print(f"Error loading shipping data: {e}")
         return None
 
-def calculate_metrics(df):
-    """Calculate performance metrics."""
-    metrics = {}
-    total_shipments = len(df)
-    total_compensated_shipments = len(df.dropna(subset=['total_compensation']))
+def factorize_sc_pairs(df):
+    """Factorize (from_sc_code, to_sc_code) into one categorical key labelled 'FROM -> TO'."""
+    from_sc, to_sc = df['from_sc_code'].cat, df['to_sc_code'].cat
+    from_codes = from_sc.codes.to_numpy(dtype=np.int32)
+    to_codes = to_sc.codes.to_numpy(dtype=np.int32)
+
+    # Combine both category codes into one integer per row; pairs missing a code become NaN
+    n_to = len(to_sc.categories)
+    pair_keys = pd.Series(from_codes * n_to + to_codes).where((from_codes >= 0) & (to_codes >= 0))
+    codes, uniques = pd.factorize(pair_keys, sort=True)
+
+    # Categories are sorted, so sorted pair keys keep the lexical (from, to) order
+    pair_keys = uniques.to_numpy(dtype=np.int64)
+    from_labels = from_sc.categories[pair_keys // n_to]
+    to_labels = to_sc.categories[pair_keys % n_to]
+    identifiers = [f"{from_sc_code} -> {to_sc_code}" for from_sc_code, to_sc_code in zip(from_labels, to_labels)]
+    return pd.Categorical.from_codes(codes, categories=identifiers)
+
+@njit(cache=True)
+def _metrics_kernel(codes, n_groups, delivery, compensation, ticket, resolution, expected):
+    """Accumulate every per-group metric in a single pass over the rows."""
+    count = np.zeros(n_groups, dtype=np.int64)
+    delivery_sum = np.zeros(n_groups)
+    delivery_count = np.zeros(n_groups)
+    on_time = np.zeros(n_groups)
+    late = np.zeros(n_groups)
+    ticket_sum = np.zeros(n_groups)
+    ticket_count = np.zeros(n_groups)
+    compensation_sum = np.zeros(n_groups)
+    compensation_count = np.zeros(n_groups)
+    resolution_sum = np.zeros(n_groups)
+    resolution_count = np.zeros(n_groups)
+
+    for i in range(codes.size):
+        group = codes[i]
+        if group < 0:  # Row has a missing key
+            continue
+        count[group] += 1
+        if not np.isnan(ticket[i]):
+            ticket_sum[group] += ticket[i]
+            ticket_count[group] += 1
+        if not np.isnan(delivery[i]):
+            delivery_sum[group] += delivery[i]
+            delivery_count[group] += 1
+            if delivery[i] <= expected:
+                on_time[group] += 1
+            else:
+                late[group] += 1
+        if not np.isnan(compensation[i]):
+            compensation_sum[group] += compensation[i]
+            compensation_count[group] += 1
+        if not np.isnan(resolution[i]):
+            resolution_sum[group] += resolution[i]
+            resolution_count[group] += 1
+
+    return (
+        delivery_sum / delivery_count,
+        on_time / count * 100,
+        late / count * 100,
+        ticket_sum / ticket_count * 100,
+        compensation_count / count * 100,
+        compensation_sum / compensation_count,
+        count,
+        np.where(compensation_count > 0, count / np.maximum(compensation_count, 1) * 100, 0.0),
+        resolution_sum / resolution_count
+    )
+
+def calculate_metrics(df, codes, labels):
+    """Calculate performance metrics per group, given each row's group code (-1 for none)."""
+    expected_delivery_days = 7  # Adjust as necessary
 
     # Calculate metrics
-    metrics['avg_delivery_time'] = df['delivery_time_business_days'].mean()
-    expected_delivery_days = 7  # Adjust as necessary
-    metrics['on_time_delivery_rate'] = (df['delivery_time_business_days'] <= expected_delivery_days).mean() * 100
-    metrics['late_delivery_rate'] = (df['delivery_time_business_days'] > expected_delivery_days).mean() * 100
-    metrics['cs_ticket_rate'] = df['has_marketplace_cs_ticket'].mean() * 100
-    metrics['compensation_rate'] = df['total_compensation'].notnull().mean() * 100
-    metrics['avg_compensation_amount'] = df['total_compensation'].dropna().mean()
-    metrics['count_parcels'] = total_shipments
-    metrics['shipment_weight'] = (total_shipments / total_compensated_shipments) * 100 if total_compensated_shipments else 0
-    df['resolution_time'] = (df['compensated_at_date'] - df['shipped_date']).dt.days
-    metrics['resolution_time_avg'] = df['resolution_time'].dropna().mean()
-    
-    return metrics
+    results = _metrics_kernel(
+        np.asarray(codes, dtype=np.int64),
+        len(labels),
+        df['delivery_time_business_days'].to_numpy(),
+        df['total_compensation'].to_numpy(),
+        df['has_marketplace_cs_ticket'].to_numpy(),
+        df['resolution_time'].to_numpy(dtype=np.float64, na_value=np.nan),
+        expected_delivery_days
+    )
+    names = [
+        'avg_delivery_time', 'on_time_delivery_rate', 'late_delivery_rate', 'cs_ticket_rate',
+        'compensation_rate', 'avg_compensation_amount', 'count_parcels', 'shipment_weight',
+        'resolution_time_avg'
+    ]
+    return pd.DataFrame(dict(zip(names, results)), index=labels)
 
 def analyze_and_consolidate(df):
     """Analyze and consolidate results by route and sortation center."""
-    consolidated_data = []
-
-    # Analyze by Route
-    routes = df['route'].unique()
-    for route in routes:
-        route_df = df[df['route'] == route]
-        metrics = calculate_metrics(route_df)
-        metrics['type'] = 'Route'
-        metrics['identifier'] = route
-        consolidated_data.append(metrics)
-
-    # Analyze by Sortation Center
-    sortation_centers = df.groupby(['from_sc_code', 'to_sc_code'])
-    for (from_sc, to_sc), group_df in sortation_centers:
-        metrics = calculate_metrics(group_df)
-        metrics['type'] = 'Sortation Center'
-        metrics['identifier'] = f"{from_sc} -> {to_sc}"
-        consolidated_data.append(metrics)
+    # Analyze by Route, keeping routes in order of first appearance
+    route_codes, routes = pd.factorize(df['route'])
+    route_metrics = calculate_metrics(df, route_codes, routes)
+    route_metrics['type'] = 'Route'
+    route_metrics['identifier'] = route_metrics.index
+
+    # Analyze by Sortation Center on the pre-factorized pair key
+    sc_pair = df['sc_pair'].cat
+    sc_metrics = calculate_metrics(df, sc_pair.codes, sc_pair.categories)
+    sc_metrics['type'] = 'Sortation Center'
+    sc_metrics['identifier'] = sc_metrics.index
 
     # Save consolidated results
-    consolidated_df = pd.DataFrame(consolidated_data)
+    consolidated_df = pd.concat([route_metrics, sc_metrics], ignore_index=True)
     consolidated_df.to_csv(os.path.join(RESULTS_DIR, COMBINED_RESULTS_FILE), index=False)
     return consolidated_df
 
 def analyze_seasonal_patterns(df):
     """Perform seasonal pattern analysis and create stacked area chart."""
-    df['shipped_month_day'] = df['shipped_date'].dt.strftime('%m-%d')
-    grouped_df = df.groupby(['shipped_month_day']).agg(
-        avg_delivery_time=('delivery_time_business_days', 'mean'),
-        avg_compensation_amount=('total_compensation', 'mean')
-    ).dropna().reset_index()
-
-    plt.figure(figsize=(12, 6))
-    grouped_df.plot(x='shipped_month_day', y=['avg_delivery_time', 'avg_compensation_amount'], figsize=(12, 6))
+    grouped_df = daily_means(df).dropna().reset_index()
+    grouped_df['shipped_month_day'] = grouped_df['shipped_month_day'].map(format_month_day)
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    grouped_df.plot(x='shipped_month_day', y=['avg_delivery_time', 'avg_compensation_amount'], ax=ax)
     plt.xlabel('Month-Day')
     plt.ylabel('Value')
     plt.title('Seasonal Patterns of Delivery Time and Compensation Amount')
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig(os.path.join(RESULTS_DIR, 'seasonal_patterns.png'))
-    plt.show()
+    fig.savefig(os.path.join(RESULTS_DIR, 'seasonal_patterns.png'), dpi=100, bbox_inches='tight')
+    if INTERACTIVE:
+        plt.show()
+    plt.close(fig)
 
 def analyze_correlation(df):
     """Perform correlation analysis and save results."""
-    df['shipped_date_mmdd'] = df['shipped_date'].dt.strftime('%m-%d')
-    grouped_df = df.groupby('shipped_date_mmdd').agg(
-        avg_delivery_time=('delivery_time_business_days', 'mean'),
-        avg_compensation_amount=('total_compensation', 'mean')
-    ).dropna().reset_index()
+    # Reuses the daily aggregate already computed for the seasonal analysis
+    grouped_df = daily_means(df).dropna().rename_axis('shipped_date_mmdd').reset_index()
+    grouped_df['shipped_date_mmdd'] = grouped_df['shipped_date_mmdd'].map(format_month_day)
 
     correlation = grouped_df['avg_delivery_time'].corr(grouped_df['avg_compensation_amount'])
     print(f"Correlation between average delivery time and compensation amount: {correlation:.2f}")
 
     grouped_df.to_csv(os.path.join(RESULTS_DIR, CORRELATION_RESULTS_FILE), index=False)
 
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(data=grouped_df, x='avg_delivery_time', y='avg_compensation_amount')
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.scatterplot(data=grouped_df, x='avg_delivery_time', y='avg_compensation_amount', ax=ax)
     plt.title('Correlation Between Average Delivery Time and Compensation Amount')
     plt.xlabel('Average Delivery Time (days)')
     plt.ylabel('Average Compensation Amount')
     plt.grid(True)
     plt.tight_layout()
-    plt.savefig(os.path.join(RESULTS_DIR, 'correlation_plot.png'))
-    plt.show()
+    fig.savefig(os.path.join(RESULTS_DIR, 'correlation_plot.png'), dpi=100, bbox_inches='tight')
+    if INTERACTIVE:
+        plt.show()
+    plt.close(fig)
 
 def analyze_to_text(df):
     """Perform textual analysis and save results to a file."""
     with open(os.path.join(RESULTS_DIR, ANALYSIS_RESULTS_FILE), 'w') as f:
         average_delivery_time = df['delivery_time_business_days'].mean()
         expected_days = 5
-        on_time_delivery_rate = (df['delivery_time_business_days'] <= expected_days).mean()
-        compensation_rate = df['total_compensation'].notnull().mean()
-        avg_compensation_amount = df['total_compensation'].dropna().mean()
-        cs_ticket_rate = df['has_marketplace_cs_ticket'].mean()
-        df['resolution_time'] = (df['compensated_at_date'] - df['shipped_date']).dt.days
+        # NumExpr fuses the comparison and the count without building a boolean array
+        delivery = df['delivery_time_business_days'].to_numpy()
+        on_time_delivery_rate = ne.evaluate('sum(where(delivery <= expected_days, 1, 0))') / delivery.size
+        # One pass over the compensation column for both the rate and the average
+        compensation = df['total_compensation'].to_numpy()
+        compensated = ~np.isnan(compensation)
+        compensated_count = compensated.sum()
+        compensation_rate = compensated_count / compensation.size
+        avg_compensation_amount = compensation[compensated].sum() / compensated_count
+        ticket = df['has_marketplace_cs_ticket'].to_numpy()
+        # Shipments without a ticket flag are left out of the rate, as with a plain mean
+        cs_ticket_rate = ne.evaluate('sum(where(ticket == 1, 1, 0))') / np.count_nonzero(~np.isnan(ticket))
         resolution_time_avg = df['resolution_time'].dropna().mean()
 
         results = (
@@ -148,7 +222,7 @@ def main():
     create_results_dir()
 
     # Load and preprocess data
-    df = load_and_preprocess_data(FILES)
+    df = load_and_preprocess_data()
     
     if df is not None:
         # Consolidate results
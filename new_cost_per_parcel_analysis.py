@@ -1,9 +1,10 @@
+import numpy as np
 import pandas as pd
 import os
 
+from data_io import get_df
+
 # Constants
-INPUT_CSV_1 = 'shipping_data_1.csv'
-INPUT_CSV_2 = 'shipping_data_2.csv'
 ORIGINAL_COST_PER_PARCEL = 6.81  # in EUR
 RESULTS_FILE = 'output/new_cost_per_parcel_analysis.csv'
 OUTPUT_DIR = 'output'
@@ -14,12 +15,15 @@ def create_output_dir():
         os.makedirs(OUTPUT_DIR)
 
 def calculate_metrics(df, volume_increase_per_day):
+    """Calculate cost metrics for an array of daily volume increase scenarios at once."""
     metrics = {}
     # Calculate total shipments
     total_shipments = len(df)
     
-    # Current average delivery time
-    avg_delivery_time = df['delivery_time_business_days'].mean()
+    # Current average delivery time; dividing the exact sum of whole days by the count
+    # yields a float64 mean, where .mean() on the float32 column would round to float32
+    delivery_time = df['delivery_time_business_days']
+    avg_delivery_time = delivery_time.sum() / delivery_time.count()
     
     # Improved average delivery time by 10%
     improved_avg_delivery_time = avg_delivery_time * 0.90
@@ -45,18 +49,14 @@ def calculate_metrics(df, volume_increase_per_day):
     metrics['volume_increase_percentage'] = volume_increase_percentage
     metrics['delivery_time_reduction'] = delivery_time_reduction
     
-    return metrics
+    # Scalar metrics are broadcast across the scenario rows
+    return pd.DataFrame(metrics)
 
 def main():
     create_output_dir()
 
-    # Read CSV files and concatenate them
-    dfs = [pd.read_csv(file) for file in [INPUT_CSV_1, INPUT_CSV_2]]
-    df = pd.concat(dfs, ignore_index=True)
-    
-    # Convert dates to datetime
-    df['shipped_date'] = pd.to_datetime(df['shipped_date'])
-    df['compensated_at_date'] = pd.to_datetime(df['compensated_at_date'], errors='coerce')
+    # Read only the delivery time column from the shared Parquet cache
+    df = get_df(columns=['delivery_time_business_days'])
     
     # Scenarios
     scenarios = {
@@ -65,15 +65,11 @@ def main():
         'optimistic': 0.08
     }
     
-    # Calculate metrics for each scenario
-    results = []
-    for scenario, volume_increase_per_day in scenarios.items():
-        metrics = calculate_metrics(df, volume_increase_per_day)
-        metrics['scenario'] = scenario
-        results.append(metrics)
+    # Calculate metrics for all scenarios in one vectorized pass
+    results_df = calculate_metrics(df, np.array(list(scenarios.values())))
+    results_df['scenario'] = list(scenarios.keys())
     
-    # Create DataFrame and save to CSV
-    results_df = pd.DataFrame(results)
+    # Save to CSV
     results_df.to_csv(RESULTS_FILE, index=False)
     
     # Print the results